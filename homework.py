@@ -1,36 +1,117 @@
+from bisect import bisect
+from collections import Counter, namedtuple
+from contextlib import contextmanager
+import hashlib
+import heapq
 from http import HTTPStatus
+from itertools import count
+import json
 import logging
-from logging.handlers import RotatingFileHandler
 import os
+import queue
+import re
+import signal
+import sqlite3
+import sys
+import threading
 import time
 
-import telegram
-from dotenv import load_dotenv
-import requests
-
-load_dotenv()
-
 LOG_FILENAME = __file__ + '.log'
 logger = logging.getLogger(__name__)
-handler = RotatingFileHandler(
-    LOG_FILENAME,
-    maxBytes=50000000,
-    backupCount=5)
-logger.setLevel(logging.DEBUG)
-logger.addHandler(handler)
-formatter = logging.Formatter(
-    '%(asctime)s, [%(levelname)s], %(message)s'
-)
-handler.setFormatter(formatter)
-
-PRACTICUM_TOKEN = os.getenv('PRACTICUM_TOKEN')
-TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
-TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
-
-RETRY_TIME = 600
+
+
+def read_environment():
+    """Читает настройки бота из переменных окружения."""
+    global PRACTICUM_TOKEN, TELEGRAM_TOKEN, TELEGRAM_CHAT_ID, HEADERS
+    global CONFIG_FILE, STATE_DB, LEASE_TTL, WORKERS, RETRY_TIME
+    global DIGEST_WINDOW, DIGEST_SIZE, OUTBOX_LIMIT, OUTBOX_ATTEMPTS
+    global DRAIN_TIMEOUT
+    global NOTIFY_TIMEOUT, NOTIFY_THREADS, ONBOARD_THREADS, API_TIMEOUT
+    global TELEGRAM_POOL_SIZE, TELEGRAM_CONNECT_TIMEOUT, TELEGRAM_READ_TIMEOUT
+    PRACTICUM_TOKEN = os.getenv('PRACTICUM_TOKEN')
+    TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
+    TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
+    HEADERS = {'Authorization': f'OAuth {PRACTICUM_TOKEN}'}
+    CONFIG_FILE = os.getenv('CONFIG_FILE')
+    STATE_DB = os.getenv('STATE_DB', __file__ + '.db')
+    LEASE_TTL = int(os.getenv('LEASE_TTL', 0))
+    WORKERS = int(os.getenv('WORKERS', 1))
+    RETRY_TIME = int(os.getenv('RETRY_TIME', 600))
+    API_TIMEOUT = float(os.getenv('API_TIMEOUT', 30))
+    DIGEST_WINDOW = int(os.getenv('DIGEST_WINDOW', 0))
+    DIGEST_SIZE = int(os.getenv('DIGEST_SIZE', 10))
+    OUTBOX_LIMIT = int(os.getenv('OUTBOX_LIMIT', 100))
+    OUTBOX_ATTEMPTS = int(os.getenv('OUTBOX_ATTEMPTS', 10))
+    DRAIN_TIMEOUT = int(os.getenv('DRAIN_TIMEOUT', 20))
+    NOTIFY_TIMEOUT = float(os.getenv('NOTIFY_TIMEOUT', 10))
+    NOTIFY_THREADS = int(os.getenv('NOTIFY_THREADS', 8))
+    ONBOARD_THREADS = int(os.getenv('ONBOARD_THREADS', 32))
+    TELEGRAM_POOL_SIZE = int(os.getenv('TELEGRAM_POOL_SIZE', NOTIFY_THREADS))
+    TELEGRAM_CONNECT_TIMEOUT = float(os.getenv('TELEGRAM_CONNECT_TIMEOUT', 5))
+    TELEGRAM_READ_TIMEOUT = float(os.getenv('TELEGRAM_READ_TIMEOUT', 10))
+
+
+read_environment()
+
 ENDPOINT = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
-HEADERS = {'Authorization': f'OAuth {PRACTICUM_TOKEN}'}
+REDACTED = '***'
 VERIABLES_ENV = ('PRACTICUM_TOKEN', 'TELEGRAM_CHAT_ID', 'TELEGRAM_TOKEN')
+RING_REPLICAS = 64
+HEALTH_INTERVAL = 5
+METRICS_INTERVAL = 60
+RESTART_BACKOFF_MAX = 300
+ONBOARD_RETRIES = 3
+ONBOARD_BACKOFF = 1
+MESSAGE_LIMIT = 4096
+DIGEST_SEPARATOR = '\n\n'
+PRIORITY_STATUS, PRIORITY_RECOVERY, PRIORITY_ERROR = range(3)
+POLL_RESULTS = ('sent', 'idle', 'skipped', 'error')
+CURRENT_DATE = re.compile(rb'"current_date"\s*:\s*\d+')
+TUNABLES = {
+    'retry_time': 'RETRY_TIME',
+    'lease_ttl': 'LEASE_TTL',
+    'digest_window': 'DIGEST_WINDOW',
+    'digest_size': 'DIGEST_SIZE',
+    'outbox_limit': 'OUTBOX_LIMIT',
+    'outbox_attempts': 'OUTBOX_ATTEMPTS',
+    'notify_timeout': 'NOTIFY_TIMEOUT',
+    'drain_timeout': 'DRAIN_TIMEOUT',
+}
+ENVIRONMENT_SETTINGS = (
+    'PRACTICUM_TOKEN', 'TELEGRAM_TOKEN', 'TELEGRAM_CHAT_ID', 'HEADERS',
+    'CONFIG_FILE', 'STATE_DB', 'LEASE_TTL', 'WORKERS', 'RETRY_TIME',
+    'API_TIMEOUT',
+    'DIGEST_WINDOW', 'DIGEST_SIZE', 'OUTBOX_LIMIT', 'OUTBOX_ATTEMPTS',
+    'DRAIN_TIMEOUT', 'NOTIFY_TIMEOUT', 'NOTIFY_THREADS', 'ONBOARD_THREADS',
+    'TELEGRAM_POOL_SIZE', 'TELEGRAM_CONNECT_TIMEOUT', 'TELEGRAM_READ_TIMEOUT',
+)
+STATE_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS workers (
+        worker TEXT PRIMARY KEY,
+        heartbeat REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS leases (
+        tenant TEXT PRIMARY KEY,
+        worker TEXT NOT NULL,
+        expires REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS progress (
+        tenant TEXT PRIMARY KEY,
+        from_date INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS tenants (
+        tenant TEXT PRIMARY KEY,
+        practicum_token TEXT NOT NULL,
+        chat_id TEXT NOT NULL,
+        telegram_token TEXT NOT NULL
+    );
+'''
+ACQUIRE_LEASE = '''
+    INSERT INTO leases (tenant, worker, expires) VALUES (?, ?, ?)
+    ON CONFLICT (tenant) DO UPDATE SET
+        worker = excluded.worker, expires = excluded.expires
+    WHERE leases.worker = excluded.worker OR leases.expires < ?
+'''
 
 SUCCESS_SEND_MESSAGE = 'Сообщение "{message}" успешно отправлено.'
 ERROR_SEND_MESSAGE = 'Не удалось отправить сообщение "{message}": {error}.'
@@ -62,6 +143,101 @@ HW_STATUS = (
 NO_TOKEN = 'Для переменных окружения {name} значение не задано.'
 PROGRAMM_ERROR = 'Сбой в работе программы: {error}.'
 NETWORK_CONNECTION_ERROR = 'Ошибка {error}. Нет соединения с интеренетом'
+STATE_ERROR = 'Ошибка хранилища состояния {path}: {error}.'
+WORKER_TENANTS = 'Воркер {worker} обслуживает тенантов: {count}.'
+WORKER_STARTED = 'Запущен воркер #{index}, pid {pid}.'
+WORKER_DIED = 'Воркер #{index}, pid {pid} завершился с кодом {code}.'
+WORKER_HUNG = 'Воркер #{index}, pid {pid} не отвечает {seconds:.0f} с.'
+WORKER_RESTART_DELAYED = 'Воркер #{index} будет перезапущен через {delay} с.'
+WORKERS_METRICS = (
+    'Метрики воркеров ({count}): {metrics}, '
+    'пропущено неизменившихся ответов {skip_rate:.0%}.'
+)
+RECOVERY_MESSAGE = 'Работа бота восстановлена.'
+MERGED_MESSAGE = '{message} (повторов: {count})'
+OUTBOX_SHED = 'Очередь отправки переполнена, отброшено: "{message}".'
+OUTBOX_GAVE_UP = (
+    'Адресат {type} не принял "{message}" за {attempts} попыток, '
+    'сообщение для него отброшено.'
+)
+NOTIFY_SUCCESS = 'Сообщение "{message}" доставлено через {type}.'
+NOTIFY_FAILED = 'Не удалось доставить через {type} "{message}": {error}.'
+NOTIFY_TIMED_OUT = 'Адресат {type} не ответил за {timeout} с.'
+UNKNOWN_NOTIFIER = 'Неизвестный тип адресата {type}.'
+UNKNOWN_TUNABLE = 'Неизвестный параметр настройки {name}.'
+CONFIG_NOT_OBJECT = 'CONFIG_FILE должен содержать объект JSON.'
+SECTION_TYPE = 'Раздел {name} в CONFIG_FILE должен быть {kind}.'
+BAD_CONFIG_TENANT = (
+    'Тенант №{index} в CONFIG_FILE: нужны строковые practicum_token и '
+    'telegram_token, chat_id и список адресатов notifiers.'
+)
+TUNING_CHANGED = 'Параметр {name} изменён: {old} -> {new}.'
+TENANTS_RELOADED = 'Тенанты перечитаны: добавлено {added}, удалено {removed}.'
+RELOAD_FAILED = 'Не удалось перечитать настройки: {error}.'
+DRAIN_EXPIRED = 'Не успели отправить до остановки сообщений: {count}.'
+TRANSPORT_METRICS = (
+    'Telegram: отправок {sends}, средняя задержка {latency:.0f} мс, '
+    'соединений {connections} на {requests} запросов.'
+)
+ONBOARD_REJECTED = 'Тенант {chat_id} не подключён: {error}'
+ONBOARD_DONE = (
+    'Проверено тенантов {total}, подключено {valid}, '
+    'не удалось проверить {unverified}.'
+)
+ONBOARD_UNVERIFIED = (
+    'Тенант {chat_id} не подключён, проверить не удалось: {error}. '
+    'Повторите onboard позже.'
+)
+ONBOARD_BAD_ROW = (
+    'строка {line}: ожидается practicum_token,chat_id[,telegram_token]'
+)
+ONBOARD_NO_BOT = 'не задан telegram_token и нет TELEGRAM_TOKEN'
+ONBOARD_USAGE = 'Использование: python homework.py onboard FILE'
+WORKERS_STOPPING = 'Остановка воркеров: {count}.'
+EMAIL_SUBJECT = 'Статус проверки домашней работы'
+TELEGRAM_THROTTLED = (
+    'Telegram ограничил отправку, '
+    'отброшено диагностических сообщений: {count}.'
+)
+
+Tenant = namedtuple(
+    'Tenant', 'practicum_token chat_id telegram_token notifiers',
+    defaults=((),)
+)
+
+outbox_sequence = count()
+worker_flags = dict(stop=False, reload=False)
+telegram_bots = {}
+telegram_transport = None
+transport_lock = threading.Lock()
+transport_metrics = Counter()
+notify_executor = None
+
+
+def setup():
+    """Загружает .env и настраивает журнал.
+
+    Импорт модуля не трогает диск и окружение: процесс бота вызывает
+    setup() перед запуском. Повторный вызов ничего не делает.
+    """
+    if logger.handlers:
+        return
+    from logging.handlers import RotatingFileHandler
+
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    read_environment()
+    handler = RotatingFileHandler(
+        LOG_FILENAME,
+        maxBytes=50000000,
+        backupCount=5)
+    logger.setLevel(logging.DEBUG)
+    logger.addHandler(handler)
+    formatter = logging.Formatter(
+        '%(asctime)s, [%(levelname)s], %(message)s'
+    )
+    handler.setFormatter(formatter)
 
 
 HOMEWORK_VERDICTS = {
@@ -73,6 +249,8 @@ HOMEWORK_VERDICTS = {
 
 def send_message(bot, message):
     """Отправляет сообщение в Telegramm."""
+    import telegram
+
     try:
         bot.send_message(TELEGRAM_CHAT_ID, message)
         logger.info(SUCCESS_SEND_MESSAGE.format(message=message))
@@ -86,30 +264,58 @@ def send_message(bot, message):
 
 def get_api_answer(current_timestamp):
     """API запрос к сервису Yandex.Practicum."""
+    return parse_answer(*request_homeworks(HEADERS, current_timestamp))
+
+
+def redacted(request_params):
+    """Параметры запроса для сообщений об ошибках: токен тенанта скрыт.
+
+    Такие сообщения уходят не только в лог, но и на webhook и почту.
+    """
+    return dict(request_params, headers={
+        name: REDACTED if name.lower() == 'authorization' else value
+        for name, value in request_params['headers'].items()
+    })
+
+
+def request_homeworks(headers, current_timestamp):
+    """HTTP-запрос к API Yandex.Practicum с заголовками тенанта.
+
+    Ответа ждём не дольше API_TIMEOUT секунд. Возвращает ответ и
+    параметры запроса для сообщений об ошибках.
+    """
     request_params = dict(
         url=ENDPOINT,
-        headers=HEADERS,
-        params={'from_date': current_timestamp}
+        headers=headers,
+        params={'from_date': current_timestamp},
+        timeout=API_TIMEOUT
     )
+    import requests
+
     try:
         response = requests.get(**request_params)
     except requests.exceptions.RequestException as error:
         raise ConnectionError(NO_ANSWER.format(
             error=error,
-            **request_params
+            **redacted(request_params)
         ))
     if response.status_code != HTTPStatus.OK:
         raise RuntimeError(REQUEST_FAILD.format(
             status_code=response.status_code,
-            **request_params
-        ))
+            **redacted(request_params)
+        )) from requests.HTTPError(response=response)
+    return response, request_params
+
+
+def parse_answer(response, request_params):
+    """Разбирает JSON ответа API и проверяет его на ошибки сервиса."""
     response_js = response.json()
     for error in ('code', 'error'):
         if error in response_js:
             raise RuntimeError(SERVICE_ERROR.format(
                 error=error,
                 meaning=response_js[error],
-                **request_params
+                **redacted(request_params)
             ))
     return response_js
 
@@ -158,27 +364,1213 @@ def check_tokens():
     return True
 
 
-def main():
-    """Основная логика работы бота."""
-    if not check_tokens():
+def load_config():
+    """Содержимое CONFIG_FILE: настройки tuning и тенанты tenants."""
+    if not CONFIG_FILE:
+        return {}
+    with open(CONFIG_FILE, encoding='utf-8') as file:
+        config = json.load(file)
+    if not isinstance(config, dict):
+        raise ValueError(CONFIG_NOT_OBJECT)
+    return config
+
+
+def config_mtime():
+    """Время изменения CONFIG_FILE, None если файла нет."""
+    try:
+        return os.stat(CONFIG_FILE).st_mtime if CONFIG_FILE else None
+    except OSError:
+        return None
+
+
+def apply_tuning(config):
+    """Применяет настройки tuning из конфига поверх окружения."""
+    tuning = config.get('tuning', {})
+    if not isinstance(tuning, dict):
+        raise ValueError(SECTION_TYPE.format(name='tuning', kind='объектом'))
+    for option, value in tuning.items():
+        if option not in TUNABLES:
+            raise ValueError(UNKNOWN_TUNABLE.format(name=option))
+        name = TUNABLES[option]
+        globals()[name] = type(globals()[name])(value)
+
+
+def item_tenant(item):
+    """Tenant из описания в CONFIG_FILE или None, если оно неверное."""
+    if not isinstance(item, dict):
+        return None
+    tenant = Tenant(
+        item.get('practicum_token'),
+        item.get('chat_id'),
+        item.get('telegram_token', TELEGRAM_TOKEN),
+        item.get('notifiers', [])
+    )
+    if not (
+        isinstance(tenant.practicum_token, str)
+        and isinstance(tenant.telegram_token, str)
+        and isinstance(tenant.chat_id, (str, int))
+        and not isinstance(tenant.chat_id, bool)
+        and isinstance(tenant.notifiers, list)
+        and all(
+            isinstance(destination, dict) and 'type' in destination
+            for destination in tenant.notifiers
+        )
+    ):
+        return None
+    return tenant._replace(notifiers=tuple(tenant.notifiers))
+
+
+def load_tenants(config, store):
+    """Тенанты бота: основной из окружения, из конфига и из хранилища.
+
+    Возвращает словарь {ключ тенанта: Tenant}.
+    """
+    items = config.get('tenants', [])
+    if not isinstance(items, list):
+        raise ValueError(SECTION_TYPE.format(name='tenants', kind='списком'))
+    tenants = [Tenant(PRACTICUM_TOKEN, TELEGRAM_CHAT_ID, TELEGRAM_TOKEN)]
+    tenants.extend(stored_tenants(store))
+    for index, item in enumerate(items, 1):
+        tenant = item_tenant(item)
+        if tenant is None:
+            raise ValueError(BAD_CONFIG_TENANT.format(index=index))
+        tenants.append(tenant)
+    for tenant in tenants:
+        for destination in tenant.notifiers:
+            if destination['type'] not in NOTIFIERS:
+                raise ValueError(
+                    UNKNOWN_NOTIFIER.format(type=destination['type'])
+                )
+    return {tenant_key(tenant): tenant for tenant in tenants}
+
+
+def tenant_key(tenant):
+    """Стабильный ключ тенанта, не раскрывающий токен."""
+    digest = hashlib.sha1(tenant.practicum_token.encode()).hexdigest()
+    return f'{tenant.chat_id}:{digest[:12]}'
+
+
+def ring_hash(value):
+    """Позиция значения на кольце консистентного хеширования."""
+    return int(hashlib.md5(value.encode()).hexdigest()[:16], 16)
+
+
+def build_ring(workers):
+    """Кольцо консистентного хеширования по живым воркерам."""
+    return sorted(
+        (ring_hash(f'{worker}#{replica}'), worker)
+        for worker in workers for replica in range(RING_REPLICAS)
+    )
+
+
+def ring_owner(ring, key):
+    """Воркер, которому по кольцу принадлежит ключ тенанта."""
+    return ring[bisect(ring, (ring_hash(key),)) % len(ring)][1]
+
+
+def lease_ttl():
+    """Срок аренды тенанта и жизни воркера без heartbeat, в секундах."""
+    return LEASE_TTL or RETRY_TIME * 2
+
+
+def open_store(path):
+    """Открывает общее для воркеров хранилище аренды в SQLite."""
+    store = sqlite3.connect(path, timeout=30, isolation_level=None)
+    store.execute('PRAGMA journal_mode=WAL')
+    store.executescript(STATE_SCHEMA)
+    return store
+
+
+@contextmanager
+def write_transaction(store):
+    """Одна транзакция записи вместо отдельной на каждый запрос."""
+    store.execute('BEGIN IMMEDIATE')
+    try:
+        yield store
+    except BaseException:
+        store.execute('ROLLBACK')
+        raise
+    store.execute('COMMIT')
+
+
+def heartbeat(store, worker_id):
+    """Отмечает воркер живым и возвращает список всех живых воркеров."""
+    now = time.time()
+    store.execute(
+        'INSERT OR REPLACE INTO workers VALUES (?, ?)', (worker_id, now)
+    )
+    store.execute(
+        'DELETE FROM workers WHERE heartbeat < ?', (now - lease_ttl(),)
+    )
+    return [worker for worker, in store.execute('SELECT worker FROM workers')]
+
+
+def acquire_lease(store, key, worker_id):
+    """Берёт или продлевает аренду тенанта, если её не держит другой."""
+    now = time.time()
+    cursor = store.execute(
+        ACQUIRE_LEASE, (key, worker_id, now + lease_ttl(), now)
+    )
+    return cursor.rowcount == 1
+
+
+def owned_tenants(store, worker_id, tenants):
+    """Ключи тенантов, которые воркер опрашивает в текущем цикле.
+
+    Тенанты распределяются консистентным хешированием по живым воркерам.
+    Аренды тенантов, ушедших к другим воркерам, освобождаются сразу,
+    поэтому при появлении или падении воркера нагрузка перебалансируется
+    без двойного опроса. Heartbeat, аренды и начальные метки времени
+    записываются одной транзакцией на цикл.
+    """
+    with write_transaction(store):
+        ring = build_ring(heartbeat(store, worker_id))
+        mine = [key for key in tenants if ring_owner(ring, key) == worker_id]
+        placeholders = ', '.join('?' * len(mine))
+        store.execute(
+            f'DELETE FROM leases WHERE worker = ? '
+            f'AND tenant NOT IN ({placeholders})',
+            (worker_id, *mine)
+        )
+        owned = [key for key in mine if acquire_lease(store, key, worker_id)]
+        now = int(time.time())
+        store.executemany(
+            'INSERT OR IGNORE INTO progress VALUES (?, ?)',
+            [(key, now) for key in owned]
+        )
+    return owned
+
+
+def keep_alive(store, worker_id):
+    """Продлевает heartbeat воркера и все его аренды."""
+    now = time.time()
+    with write_transaction(store):
+        store.execute(
+            'UPDATE workers SET heartbeat = ? WHERE worker = ?',
+            (now, worker_id)
+        )
+        store.execute(
+            'UPDATE leases SET expires = ? WHERE worker = ?',
+            (now + lease_ttl(), worker_id)
+        )
+
+
+def report_health(state, worker_id, metrics, metrics_queue):
+    """Отмечает воркер живым в хранилище и отправляет счётчики супервизору.
+
+    Вызывается и посреди цикла опроса, не реже HEALTH_INTERVAL, чтобы
+    долгий цикл не принимали за зависание ни супервизор, ни другие
+    воркеры.
+    """
+    state['reported'] = time.time()
+    try:
+        keep_alive(state['store'], worker_id)
+    except sqlite3.Error as error:
+        logger.error(STATE_ERROR.format(path=STATE_DB, error=error))
+    if metrics_queue is not None:
+        metrics_queue.put((os.getpid(), worker_id, dict(metrics)))
+
+
+def leave_store(store, worker_id):
+    """Снимает воркер с учёта и освобождает его аренды."""
+    store.execute('DELETE FROM leases WHERE worker = ?', (worker_id,))
+    store.execute('DELETE FROM workers WHERE worker = ?', (worker_id,))
+    store.close()
+
+
+def load_from_date(store, key):
+    """Метка времени, с которой запрашиваются статусы тенанта."""
+    row = store.execute(
+        'SELECT from_date FROM progress WHERE tenant = ?', (key,)
+    ).fetchone()
+    if row is not None:
+        return row[0]
+    store.execute(
+        'INSERT OR IGNORE INTO progress VALUES (?, ?)', (key, int(time.time()))
+    )
+    return load_from_date(store, key)
+
+
+def save_from_date(store, key, from_date):
+    """Сохраняет метку времени, до которой статусы тенанта доставлены.
+
+    Метка только растёт, даже если статусы доставлены не по порядку.
+    """
+    store.execute(
+        'UPDATE progress SET from_date = ? WHERE tenant = ? AND from_date < ?',
+        (from_date, key, from_date)
+    )
+
+
+def get_transport(pool_size=None):
+    """HTTP-транспорт к api.telegram.org, общий для всех ботов процесса.
+
+    Один пул из pool_size (по умолчанию TELEGRAM_POOL_SIZE) постоянных
+    соединений с TCP keep-alive вместо отдельного пула на каждый бот.
+    Размер задаётся при первом вызове.
+    """
+    global telegram_transport
+    if telegram_transport is None:
+        from telegram.utils.request import Request
+
+        telegram_transport = Request(
+            con_pool_size=pool_size or TELEGRAM_POOL_SIZE,
+            connect_timeout=TELEGRAM_CONNECT_TIMEOUT,
+            read_timeout=TELEGRAM_READ_TIMEOUT
+        )
+    return telegram_transport
+
+
+def get_bot(token):
+    """Бот Telegram для токена, общий для всех тенантов процесса."""
+    with transport_lock:
+        if token not in telegram_bots:
+            import telegram
+
+            telegram_bots[token] = telegram.Bot(
+                token=token, request=get_transport()
+            )
+        return telegram_bots[token]
+
+
+def transport_stats():
+    """Счётчики транспорта Telegram: отправки, задержка и соединения.
+
+    telegram_connections - сколько соединений открыто, telegram_requests -
+    сколько запросов через них прошло; разница - повторные использования.
+    Их читаем из внутренностей PTB и urllib3, поэтому если пул устроен
+    иначе (другая версия, менеджер App Engine), они просто не выводятся.
+    """
+    stats = dict(transport_metrics)
+    if telegram_transport is None:
+        return stats
+    try:
+        pools = telegram_transport._con_pool.pools
+        pools = [pools.get(key) for key in pools.keys()]
+    except AttributeError:
+        return stats
+    stats['telegram_connections'] = sum(
+        getattr(pool, 'num_connections', 0) for pool in pools
+    )
+    stats['telegram_requests'] = sum(
+        getattr(pool, 'num_requests', 0) for pool in pools
+    )
+    return stats
+
+
+def notify_telegram(destination, message):
+    """Адресат telegram: chat_id и token бота."""
+    bot = get_bot(destination['token'])
+    started = time.monotonic()
+    bot.send_message(
+        destination['chat_id'], message,
+        timeout=destination.get('timeout', NOTIFY_TIMEOUT)
+    )
+    latency = (time.monotonic() - started) * 1000
+    with transport_lock:
+        transport_metrics['telegram_sends'] += 1
+        transport_metrics['telegram_send_ms'] += int(latency)
+
+
+def notify_webhook(destination, message):
+    """Адресат webhook: POST {"text": ...} на url."""
+    import requests
+
+    response = requests.post(
+        destination['url'], json={'text': message},
+        timeout=destination.get('timeout', NOTIFY_TIMEOUT)
+    )
+    response.raise_for_status()
+
+
+def notify_smtp(destination, message):
+    """Адресат smtp: письмо с host[:port] от sender на to.
+
+    Необязательные user и password включают авторизацию, starttls - TLS.
+    """
+    from email.message import EmailMessage
+    import smtplib
+
+    email = EmailMessage()
+    email['Subject'] = EMAIL_SUBJECT
+    email['From'] = destination['sender']
+    email['To'] = destination['to']
+    email.set_content(message)
+    with smtplib.SMTP(
+        destination['host'], destination.get('port', 25),
+        timeout=destination.get('timeout', NOTIFY_TIMEOUT)
+    ) as smtp:
+        if destination.get('starttls'):
+            smtp.starttls()
+        if 'user' in destination:
+            smtp.login(destination['user'], destination['password'])
+        smtp.send_message(email)
+
+
+NOTIFIERS = {
+    'telegram': notify_telegram,
+    'webhook': notify_webhook,
+    'smtp': notify_smtp,
+}
+
+
+def tenant_destinations(tenant):
+    """Адресаты уведомлений тенанта: его чат Telegram и notifiers."""
+    return (
+        dict(
+            type='telegram',
+            token=tenant.telegram_token,
+            chat_id=tenant.chat_id
+        ),
+        *tenant.notifiers
+    )
+
+
+def get_notify_executor():
+    """Пул потоков для параллельной рассылки, создаётся при первой отправке."""
+    global notify_executor
+    if notify_executor is None:
+        from concurrent.futures import ThreadPoolExecutor
+
+        notify_executor = ThreadPoolExecutor(
+            max_workers=NOTIFY_THREADS, thread_name_prefix='notify'
+        )
+    return notify_executor
+
+
+def is_permanent(error):
+    """Ошибка, которую повторный запрос не исправит.
+
+    Если тип ошибки ничего не говорит, решает её причина (__cause__):
+    так классифицируются ошибки запроса к API.
+    """
+    import requests
+    import smtplib
+
+    import telegram
+
+    if isinstance(error, (
+        telegram.error.BadRequest, telegram.error.Unauthorized,
+        telegram.error.InvalidToken
+    )):
+        return True
+    if isinstance(error, requests.HTTPError):
+        return (
+            error.response is not None
+            and 400 <= error.response.status_code < 500
+            and error.response.status_code != HTTPStatus.TOO_MANY_REQUESTS
+        )
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code >= 500
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(
+            code >= 500 for code, _ in error.recipients.values()
+        )
+    if error.__cause__ is not None:
+        return is_permanent(error.__cause__)
+    return False
+
+
+def notify(destinations, message, stalled):
+    """Параллельно рассылает сообщение адресатам.
+
+    Каждого адресата ждём не дольше его timeout с начала рассылки.
+    Не ответившие попадают в stalled и пропускаются до конца текущей
+    рассылки очереди, чтобы медленный адресат не задерживал остальных.
+    Возвращает адресатов для повторной попытки и признак ограничения
+    отправки со стороны Telegram.
+    """
+    from concurrent import futures
+
+    import telegram
+
+    pending = {
+        get_notify_executor().submit(
+            NOTIFIERS[destination['type']], destination, message
+        ): destination
+        for destination in destinations if destination not in stalled
+    }
+    retry = [destination for destination in destinations
+             if destination in stalled]
+    throttled = False
+    started = time.time()
+    for future, destination in pending.items():
+        timeout = destination.get('timeout', NOTIFY_TIMEOUT)
+        try:
+            future.result(timeout=max(started + timeout - time.time(), 0))
+            logger.info(NOTIFY_SUCCESS.format(
+                message=message, type=destination['type']
+            ))
+        except futures.TimeoutError:
+            logger.error(NOTIFY_TIMED_OUT.format(
+                type=destination['type'], timeout=timeout
+            ))
+            stalled.append(destination)
+            retry.append(destination)
+        except Exception as error:
+            logger.error(NOTIFY_FAILED.format(
+                type=destination['type'], message=message, error=error
+            ), exc_info=True)
+            throttled |= isinstance(error, telegram.error.RetryAfter)
+            if not is_permanent(error):
+                retry.append(destination)
+    return retry, throttled
+
+
+def add_to_digest(digests, destinations, message, progress=()):
+    """Откладывает сообщение в дайджест для этих адресатов.
+
+    Тенанты с общим чатом и адресатами копят один дайджест на всех.
+    """
+    key = json.dumps(destinations, sort_keys=True)
+    digest = digests.get(key)
+    if digest is None:
+        digest = digests[key] = dict(
+            destinations=destinations, started=time.time(), messages=[],
+            progress=[]
+        )
+    digest['messages'].append(message)
+    digest['progress'].extend(progress)
+
+
+def join_messages(messages, limit=MESSAGE_LIMIT):
+    """Склеивает сообщения в тексты не длиннее limit символов."""
+    texts = []
+    text = ''
+    for message in messages:
+        message = message[:limit]
+        if text and len(text) + len(DIGEST_SEPARATOR) + len(message) <= limit:
+            text += DIGEST_SEPARATOR + message
+            continue
+        if text:
+            texts.append(text)
+        text = message
+    if text:
+        texts.append(text)
+    return texts
+
+
+def flush_digests(digests, outbox, force=False):
+    """Ставит в очередь дайджесты, у которых истекло окно или набран размер."""
+    now = time.time()
+    for key, digest in list(digests.items()):
+        if not (
+            force
+            or len(digest['messages']) >= DIGEST_SIZE
+            or now - digest['started'] >= DIGEST_WINDOW
+        ):
+            continue
+        del digests[key]
+        texts = join_messages(digest['messages'])
+        for text in texts[:-1]:
+            enqueue(outbox, PRIORITY_STATUS, digest['destinations'], text)
+        enqueue(
+            outbox, PRIORITY_STATUS, digest['destinations'], texts[-1],
+            digest['progress']
+        )
+
+
+def enqueue(outbox, priority, destinations, message, progress=()):
+    """Ставит сообщение в приоритетную очередь отправки.
+
+    Одинаковые диагностические сообщения тем же адресатам склеиваются в
+    одно, а при переполнении очереди отбрасываются самые новые из
+    наименее важных. Изменения статусов не отбрасываются никогда.
+    progress - пары (тенант, from_date), которые можно сохранить после
+    доставки сообщения.
+    """
+    if priority == PRIORITY_ERROR:
+        for item in outbox:
+            if item[0] == priority and item[2:4] == [destinations, message]:
+                item[4] += 1
+                return
+    heapq.heappush(outbox, [
+        priority, next(outbox_sequence), destinations, message, 1, 0,
+        tuple(progress)
+    ])
+    if len(outbox) <= OUTBOX_LIMIT:
+        return
+    victim = max(outbox)
+    if victim[0] != PRIORITY_STATUS:
+        outbox.remove(victim)
+        heapq.heapify(outbox)
+        logger.warning(OUTBOX_SHED.format(message=victim[3]))
+
+
+def drain_outbox(outbox, deadline=None):
+    """Отправляет очередь в порядке приоритета, но не позже deadline.
+
+    Статусы для адресатов, которым временно не удалось доставить, остаются
+    в очереди, но не дольше OUTBOX_ATTEMPTS попыток. Если Telegram
+    ограничил частоту отправки, рассылка прерывается, а диагностические
+    сообщения отбрасываются. Рассылка без deadline прерывается по SIGTERM,
+    остаток дорабатывает финальная рассылка с DRAIN_TIMEOUT. Возвращает
+    progress доставленных сообщений.
+    """
+    delivered = []
+    postponed = []
+    stalled = []
+    while outbox and (deadline is None or time.time() < deadline):
+        if deadline is None and worker_flags['stop']:
+            break
+        item = heapq.heappop(outbox)
+        priority, _, destinations, message, repeats, attempts, progress = item
+        if repeats > 1:
+            message = MERGED_MESSAGE.format(message=message, count=repeats)
+        retry, throttled = notify(destinations, message, stalled)
+        if not throttled:
+            item[5] = attempts = attempts + 1
+        if retry and attempts >= OUTBOX_ATTEMPTS:
+            for destination in retry:
+                logger.warning(OUTBOX_GAVE_UP.format(
+                    type=destination['type'], message=message,
+                    attempts=attempts
+                ))
+            retry = []
+        if retry and priority != PRIORITY_ERROR:
+            item[2] = tuple(retry)
+            postponed.append(item)
+        else:
+            delivered.extend(progress)
+        if throttled:
+            kept = [queued for queued in outbox if queued[0] != PRIORITY_ERROR]
+            logger.warning(TELEGRAM_THROTTLED.format(
+                count=len(outbox) - len(kept)
+            ))
+            outbox[:] = kept
+            break
+    outbox.extend(postponed)
+    heapq.heapify(outbox)
+    return delivered
+
+
+def drain_and_save(state, deadline=None):
+    """Отправляет очередь и сохраняет from_date доставленных статусов."""
+    delivered = drain_outbox(state['outbox'], deadline)
+    if not delivered:
+        return
+    try:
+        with write_transaction(state['store']):
+            for key, from_date in delivered:
+                save_from_date(state['store'], key, from_date)
+    except sqlite3.Error as error:
+        logger.error(STATE_ERROR.format(path=STATE_DB, error=error))
         return
-    bot = telegram.Bot(token=TELEGRAM_TOKEN)
-    current_timestamp = int(time.time())
-    while True:
+    for key, from_date in delivered:
+        if state['pending'].get(key) == from_date:
+            del state['pending'][key]
+
+
+def sleep_until(deadline):
+    """Спит до deadline, просыпаясь раньше по сигналу остановки или reload."""
+    while time.time() < deadline and not any(worker_flags.values()):
+        time.sleep(min(deadline - time.time(), 1))
+
+
+def wait_next_cycle(state):
+    """Ждёт RETRY_TIME, попутно отправляя созревшие дайджесты."""
+    next_cycle = time.time() + RETRY_TIME
+    while not any(worker_flags.values()):
+        flush_digests(state['digests'], state['outbox'])
+        drain_and_save(state)
+        wake = min([next_cycle] + [
+            digest['started'] + DIGEST_WINDOW
+            for digest in state['digests'].values()
+        ])
+        sleep_until(wake)
+        if wake >= next_cycle:
+            break
+
+
+def deliver_status(state, key, destinations, message, from_date):
+    """Ставит статус в очередь или, в режиме дайджеста, в дайджест.
+
+    from_date тенанта сохраняется только после доставки статуса, а до
+    тех пор следующие опросы идут от него без записи в хранилище.
+    """
+    state['pending'][key] = from_date
+    progress = ((key, from_date),)
+    if DIGEST_WINDOW:
+        add_to_digest(state['digests'], destinations, message, progress)
+    else:
+        enqueue(
+            state['outbox'], PRIORITY_STATUS, destinations, message, progress
+        )
+
+
+def response_fingerprint(content):
+    """Отпечаток значимой части ответа API - всего, кроме current_date."""
+    return hashlib.blake2b(
+        CURRENT_DATE.sub(b'', content), digest_size=16
+    ).digest()
+
+
+def process_answer(state, key, destinations, answer, current_timestamp):
+    """Проверяет ответ API и ставит изменение статуса в очередь."""
+    homeworks = check_response(answer)
+    if homeworks:
+        deliver_status(
+            state, key, destinations, parse_status(homeworks[0]),
+            answer.get('current_date', current_timestamp)
+        )
+    return 'sent' if homeworks else 'idle'
+
+
+def save_tenants(store, tenants):
+    """Сохраняет тенантов в хранилище одной транзакцией."""
+    with write_transaction(store):
+        store.executemany(
+            'INSERT OR REPLACE INTO tenants VALUES (?, ?, ?, ?)',
+            [
+                (tenant_key(tenant), tenant.practicum_token,
+                 str(tenant.chat_id), tenant.telegram_token)
+                for tenant in tenants
+            ]
+        )
+
+
+def stored_tenants(store):
+    """Тенанты, подключённые через onboard."""
+    return [
+        Tenant(*row) for row in store.execute(
+            'SELECT practicum_token, chat_id, telegram_token FROM tenants'
+        )
+    ]
+
+
+def tenants_version(store):
+    """Признак изменения таблицы тенантов в хранилище."""
+    return store.execute(
+        'SELECT count(*), max(rowid) FROM tenants'
+    ).fetchone()
+
+
+def check_tenant(state, key, tenant):
+    """Один цикл проверки статуса работ тенанта.
+
+    Если значимая часть ответа совпала с последним успешно обработанным,
+    разбор и проверка пропускаются. Возвращает итог цикла для метрик:
+    sent, idle, skipped или error.
+    """
+    destinations = tenant_destinations(tenant)
+    current_timestamp = state['pending'].get(key) or load_from_date(
+        state['store'], key
+    )
+    try:
+        response, request_params = request_homeworks(
+            {'Authorization': f'OAuth {tenant.practicum_token}'},
+            current_timestamp
+        )
+        fingerprint = response_fingerprint(response.content)
+        if state['fingerprints'].get(key) == fingerprint:
+            return 'skipped'
+        result = process_answer(
+            state, key, destinations,
+            parse_answer(response, request_params), current_timestamp
+        )
+        state['fingerprints'][key] = fingerprint
+        if key in state['failing']:
+            state['failing'].discard(key)
+            enqueue(
+                state['outbox'], PRIORITY_RECOVERY, destinations,
+                RECOVERY_MESSAGE
+            )
+        return result
+    except Exception as error:
+        message = PROGRAMM_ERROR.format(error=error)
+        logger.error(message, exc_info=True)
+        state['fingerprints'].pop(key, None)
+        state['failing'].add(key)
+        enqueue(state['outbox'], PRIORITY_ERROR, destinations, message)
+        return 'error'
+
+
+def request_stop(signum, frame):
+    """Обработчик SIGTERM: завершить работу после текущего шага."""
+    worker_flags['stop'] = True
+
+
+def request_reload(signum, frame):
+    """Обработчик SIGHUP: перечитать настройки."""
+    worker_flags['reload'] = True
+
+
+def install_signal_handlers():
+    """Подключает обработчики SIGTERM и SIGHUP (если он есть в ОС)."""
+    signal.signal(signal.SIGTERM, request_stop)
+    if hasattr(signal, 'SIGHUP'):
+        signal.signal(signal.SIGHUP, request_reload)
+
+
+def reload_worker(state, tenants):
+    """Перечитывает .env и CONFIG_FILE и применяет изменения на лету.
+
+    Состояние не изменившихся тенантов сохраняется, накопленные дайджесты
+    отправляются в свой срок. Если окружение или конфиг не читаются, все
+    настройки из ENVIRONMENT_SETTINGS и тенанты остаются прежними.
+    """
+    from dotenv import load_dotenv
+
+    worker_flags['reload'] = False
+    state['config_mtime'] = config_mtime()
+    before = {name: globals()[name] for name in ENVIRONMENT_SETTINGS}
+    try:
+        load_dotenv(override=True)
+        read_environment()
+        config = load_config()
+        apply_tuning(config)
+        state['tenants_version'] = tenants_version(state['store'])
+        new_tenants = load_tenants(config, state['store'])
+    except (
+        OSError, ValueError, KeyError, TypeError, sqlite3.Error
+    ) as error:
+        globals().update(before)
+        logger.error(RELOAD_FAILED.format(error=error), exc_info=True)
+        return tenants
+    for name in TUNABLES.values():
+        old = before[name]
+        if globals()[name] != old:
+            logger.info(TUNING_CHANGED.format(
+                name=name, old=old, new=globals()[name]
+            ))
+    removed = tenants.keys() - new_tenants.keys()
+    for key in removed:
+        state['failing'].discard(key)
+        state['fingerprints'].pop(key, None)
+        state['pending'].pop(key, None)
+    logger.info(TENANTS_RELOADED.format(
+        added=len(new_tenants.keys() - tenants.keys()), removed=len(removed)
+    ))
+    return new_tenants
+
+
+def reload_needed(state):
+    """Пришёл SIGHUP, изменился CONFIG_FILE или тенанты в хранилище."""
+    return (
+        worker_flags['reload']
+        or config_mtime() != state['config_mtime']
+        or tenants_version(state['store']) != state['tenants_version']
+    )
+
+
+def run_worker(metrics_queue=None):
+    """Цикл опроса воркера по доставшейся ему части тенантов.
+
+    После каждого цикла и не реже HEALTH_INTERVAL внутри него воркер
+    продлевает heartbeat и аренды и отправляет свои счётчики в
+    metrics_queue, по которой супервизор следит за его здоровьем. По
+    SIGHUP или при изменении CONFIG_FILE или подключении новых тенантов
+    через onboard настройки перечитываются без перезапуска, по SIGTERM
+    очередь отправки дорабатывается не дольше DRAIN_TIMEOUT.
+    """
+    import socket
+
+    setup()
+    install_signal_handlers()
+    worker_id = f'{socket.gethostname()}:{os.getpid()}'
+    config = load_config()
+    apply_tuning(config)
+    store = open_store(STATE_DB)
+    state = dict(
+        store=store,
+        digests={},
+        outbox=[],
+        failing=set(),
+        fingerprints={},
+        pending={},
+        reported=time.time(),
+        config_mtime=config_mtime(),
+        tenants_version=tenants_version(store),
+    )
+    tenants = load_tenants(config, store)
+    metrics = Counter()
+    try:
+        while not worker_flags['stop']:
+            if reload_needed(state):
+                tenants = reload_worker(state, tenants)
+            try:
+                keys = owned_tenants(state['store'], worker_id, tenants)
+            except sqlite3.Error as error:
+                logger.error(STATE_ERROR.format(path=STATE_DB, error=error))
+                keys = []
+            logger.debug(WORKER_TENANTS.format(
+                worker=worker_id, count=len(keys)
+            ))
+            for key in keys:
+                if worker_flags['stop']:
+                    break
+                metrics[check_tenant(state, key, tenants[key])] += 1
+                if time.time() - state['reported'] >= HEALTH_INTERVAL:
+                    report_health(state, worker_id, metrics, metrics_queue)
+            metrics['cycles'] += 1
+            for name, value in transport_stats().items():
+                metrics[name] = value
+            log_metrics(logging.DEBUG, 1, metrics)
+            report_health(state, worker_id, metrics, metrics_queue)
+            wait_next_cycle(state)
+    finally:
+        flush_digests(state['digests'], state['outbox'], force=True)
+        drain_and_save(state, deadline=time.time() + DRAIN_TIMEOUT)
+        if state['outbox']:
+            logger.error(DRAIN_EXPIRED.format(count=len(state['outbox'])))
+        leave_store(state['store'], worker_id)
+
+
+def start_worker(index, slot, metrics_queue):
+    """Запускает процесс воркера в ячейке пула."""
+    import multiprocessing
+
+    process = multiprocessing.Process(
+        target=run_worker, args=(metrics_queue,), daemon=True
+    )
+    process.start()
+    slot.update(process=process, pid=process.pid, seen=time.time())
+    logger.info(WORKER_STARTED.format(index=index, pid=process.pid))
+
+
+def restart_workers(pool, metrics, metrics_queue):
+    """Перезапускает упавшие и переставшие отчитываться воркеры.
+
+    Воркер, который падает, не успев отчитаться, перезапускается с
+    экспоненциально растущей задержкой, не больше RESTART_BACKOFF_MAX.
+    """
+    now = time.time()
+    for index, slot in pool.items():
+        process = slot['process']
+        if process is None:
+            if now >= slot['restart_at']:
+                start_worker(index, slot, metrics_queue)
+            continue
+        if process.is_alive():
+            silence = now - slot['seen']
+            if silence < lease_ttl():
+                continue
+            logger.error(WORKER_HUNG.format(
+                index=index, pid=process.pid, seconds=silence
+            ))
+            process.kill()
+            process.join()
+        else:
+            logger.error(WORKER_DIED.format(
+                index=index, pid=process.pid, code=process.exitcode
+            ))
+        metrics.pop(index, None)
+        slot['failures'] += 1
+        delay = min(
+            HEALTH_INTERVAL * 2 ** (slot['failures'] - 1), RESTART_BACKOFF_MAX
+        )
+        slot.update(process=None, restart_at=now + delay)
+        logger.info(WORKER_RESTART_DELAYED.format(index=index, delay=delay))
+
+
+def collect_metrics(metrics_queue, pool, metrics):
+    """Собирает отчёты воркеров, ожидая их не дольше HEALTH_INTERVAL.
+
+    Метрики хранятся по номеру воркера в пуле, отчёт сбрасывает счётчик
+    неудачных перезапусков.
+    """
+    deadline = time.time() + HEALTH_INTERVAL
+    while not worker_flags['stop']:
         try:
-            response = get_api_answer(current_timestamp)
-            homeworks = check_response(response)
-            if homeworks and send_message(bot, parse_status(homeworks[0])):
-                current_timestamp = response.get(
-                    'current_date', current_timestamp
-                )
+            pid, _, counters = metrics_queue.get(
+                timeout=max(min(deadline - time.time(), 1), 0)
+            )
+        except queue.Empty:
+            if time.time() >= deadline:
+                return
+            continue
+        for index, slot in pool.items():
+            if slot['pid'] == pid:
+                slot.update(seen=time.time(), failures=0)
+                metrics[index] = counters
+
+
+def total_metrics(metrics):
+    """Суммарные счётчики по всем воркерам."""
+    total = Counter()
+    for counters in metrics.values():
+        total.update(counters)
+    return total
+
+
+def log_metrics(level, workers, counters):
+    """Пишет в журнал метрики опросов и транспорта Telegram."""
+    logger.log(level, WORKERS_METRICS.format(
+        count=workers, metrics=dict(counters), skip_rate=skip_rate(counters)
+    ))
+    if counters['telegram_sends']:
+        logger.log(level, TRANSPORT_METRICS.format(
+            sends=counters['telegram_sends'],
+            latency=counters['telegram_send_ms'] / counters['telegram_sends'],
+            connections=counters['telegram_connections'],
+            requests=counters['telegram_requests']
+        ))
+
+
+def skip_rate(counters):
+    """Доля опросов, пропущенных по совпавшему отпечатку ответа."""
+    polls = sum(counters[result] for result in POLL_RESULTS)
+    return counters['skipped'] / polls if polls else 0
+
+
+def stop_workers(pool):
+    """Останавливает воркеры, давая им DRAIN_TIMEOUT на отправку очереди."""
+    processes = [
+        slot['process'] for slot in pool.values() if slot['process']
+    ]
+    logger.info(WORKERS_STOPPING.format(count=len(processes)))
+    for process in processes:
+        process.terminate()
+    deadline = time.time() + DRAIN_TIMEOUT
+    for process in processes:
+        process.join(max(deadline - time.time(), 0))
+        if process.is_alive():
+            process.kill()
+
+
+def reload_supervisor(pool):
+    """Перечитывает .env и CONFIG_FILE в супервизоре, как воркеры.
+
+    Без этого супервизор считал бы воркеры зависшими по устаревшему
+    lease_ttl. SIGHUP пересылается воркерам, при ошибке в окружении или
+    конфиге остаются прежние настройки.
+    """
+    from dotenv import load_dotenv
+
+    if worker_flags['reload']:
+        worker_flags['reload'] = False
+        for slot in pool.values():
+            if slot['process'] and slot['process'].is_alive():
+                os.kill(slot['pid'], signal.SIGHUP)
+    before = {name: globals()[name] for name in ENVIRONMENT_SETTINGS}
+    try:
+        load_dotenv(override=True)
+        read_environment()
+        apply_tuning(load_config())
+    except (OSError, ValueError, KeyError, TypeError) as error:
+        globals().update(before)
+        logger.error(RELOAD_FAILED.format(error=error), exc_info=True)
+
+
+def supervise(count):
+    """Супервизор пула из count процессов-воркеров.
+
+    Тенанты делятся между воркерами через общее хранилище аренды,
+    супервизор перезапускает упавшие воркеры и агрегирует их метрики.
+    По SIGHUP или при изменении CONFIG_FILE супервизор перечитывает
+    настройки, по SIGTERM воркеры останавливаются.
+    """
+    import multiprocessing
+
+    install_signal_handlers()
+    apply_tuning(load_config())
+    mtime = config_mtime()
+    metrics_queue = multiprocessing.Queue()
+    pool = {
+        index: dict(process=None, pid=None, seen=0, failures=0, restart_at=0)
+        for index in range(count)
+    }
+    metrics = {}
+    reported = time.time()
+    try:
+        while not worker_flags['stop']:
+            restart_workers(pool, metrics, metrics_queue)
+            collect_metrics(metrics_queue, pool, metrics)
+            if worker_flags['reload'] or config_mtime() != mtime:
+                mtime = config_mtime()
+                reload_supervisor(pool)
+            if time.time() - reported >= METRICS_INTERVAL:
+                log_metrics(logging.INFO, len(metrics), total_metrics(metrics))
+                reported = time.time()
+    finally:
+        stop_workers(pool)
+
+
+def read_tenants_file(path):
+    """Тенанты из CSV: practicum_token,chat_id[,telegram_token].
+
+    Пустые строки и строки, начинающиеся с #, пропускаются. Строки с
+    другим числом полей, пустым токеном или чатом и тенанты без бота
+    отклоняются с записью в лог.
+    """
+    import csv
+
+    tenants = []
+    with open(path, encoding='utf-8', newline='') as file:
+        reader = csv.reader(file)
+        for row in reader:
+            if not row or row[0].startswith('#'):
+                continue
+            row = [value.strip() for value in row]
+            if len(row) not in (2, 3) or not all(row[:2]):
+                logger.warning(ONBOARD_REJECTED.format(
+                    chat_id=row[1] if row[1:] else '?',
+                    error=ONBOARD_BAD_ROW.format(line=reader.line_num)
+                ))
+                continue
+            tenant = Tenant(
+                row[0], row[1],
+                row[2] if row[2:] and row[2] else TELEGRAM_TOKEN
+            )
+            if not tenant.telegram_token:
+                logger.warning(ONBOARD_REJECTED.format(
+                    chat_id=tenant.chat_id, error=ONBOARD_NO_BOT
+                ))
+                continue
+            tenants.append(tenant)
+    return tenants
+
+
+def check_practicum_token(token):
+    """Ошибка проверки токена Yandex.Practicum или None.
+
+    Временные сбои (сеть, 429, 5xx) пробрасываются.
+    """
+    try:
+        answer = request_homeworks(
+            {'Authorization': f'OAuth {token}'}, int(time.time())
+        )
+    except Exception as error:
+        if is_permanent(error):
+            return str(error)
+        raise
+    try:
+        parse_answer(*answer)
+    except Exception as error:
+        return str(error)
+
+
+def check_telegram_token(token):
+    """Ошибка проверки токена бота Telegram (getMe) или None.
+
+    Временные сбои (RetryAfter, TimedOut, NetworkError) пробрасываются.
+    """
+    try:
+        get_bot(token).get_me()
+    except Exception as error:
+        if is_permanent(error):
+            return str(error)
+        raise
+
+
+def check_telegram_chat(token, chat_id):
+    """Ошибка проверки доступа бота к чату (getChat) или None.
+
+    Временные сбои пробрасываются.
+    """
+    try:
+        get_bot(token).get_chat(chat_id)
+    except Exception as error:
+        if is_permanent(error):
+            return str(error)
+        raise
+
+
+def retry_check(check, *args):
+    """Проверка с повторами при временных сбоях.
+
+    Пауза растёт вдвое с каждой попыткой, после RetryAfter ждём столько,
+    сколько попросил Telegram. Если ONBOARD_RETRIES попыток не хватило,
+    исключение пробрасывается.
+    """
+    for attempt in range(ONBOARD_RETRIES):
+        try:
+            return check(*args)
         except Exception as error:
-            message = PROGRAMM_ERROR.format(error=error)
-            logger.error(message, exc_info=True)
-            send_message(bot, message)
+            if attempt == ONBOARD_RETRIES - 1:
+                raise
+            time.sleep(getattr(
+                error, 'retry_after', ONBOARD_BACKOFF * 2 ** attempt
+            ))
 
-        time.sleep(RETRY_TIME)
+
+def submit_checks(executor, check, arguments):
+    """Запускает проверку один раз на каждый уникальный набор аргументов."""
+    return {
+        args: executor.submit(retry_check, check, *args)
+        for args in set(arguments)
+    }
+
+
+def passed(future):
+    """Проверка завершилась и ошибок не нашла."""
+    return future.exception() is None and future.result() is None
+
+
+def onboard(path):
+    """Массово подключает тенантов из CSV-файла.
+
+    Учётные данные проверяются параллельно не более чем в ONBOARD_THREADS
+    потоков, каждый токен и чат - один раз, сколько бы тенантов их ни
+    делили. Пул соединений с Telegram расширяется до числа потоков, чтобы
+    проверки не ждали соединений. В хранилище попадают только прошедшие
+    проверку тенанты, работающие воркеры подхватывают их без перезапуска.
+    Тенанты, которых из-за временных сбоев проверить не удалось, не
+    отклоняются, а попадают в лог как непроверенные. Возвращает число
+    подключённых.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    tenants = read_tenants_file(path)
+    get_transport(max(TELEGRAM_POOL_SIZE, ONBOARD_THREADS))
+    with ThreadPoolExecutor(max_workers=ONBOARD_THREADS) as executor:
+        practicum = submit_checks(executor, check_practicum_token, [
+            (tenant.practicum_token,) for tenant in tenants
+        ])
+        bots = submit_checks(executor, check_telegram_token, [
+            (tenant.telegram_token,) for tenant in tenants
+        ])
+        chats = submit_checks(executor, check_telegram_chat, [
+            (tenant.telegram_token, tenant.chat_id) for tenant in tenants
+            if passed(bots[(tenant.telegram_token,)])
+        ])
+    valid = []
+    unverified = 0
+    for tenant in tenants:
+        try:
+            error = (
+                practicum[(tenant.practicum_token,)].result()
+                or bots[(tenant.telegram_token,)].result()
+                or chats[(tenant.telegram_token, tenant.chat_id)].result()
+            )
+        except Exception as failure:
+            logger.warning(ONBOARD_UNVERIFIED.format(
+                chat_id=tenant.chat_id, error=failure
+            ))
+            unverified += 1
+            continue
+        if error:
+            logger.warning(ONBOARD_REJECTED.format(
+                chat_id=tenant.chat_id, error=error
+            ))
+        else:
+            valid.append(tenant)
+    store = open_store(STATE_DB)
+    try:
+        save_tenants(store, valid)
+    finally:
+        store.close()
+    logger.info(ONBOARD_DONE.format(
+        total=len(tenants), valid=len(valid), unverified=unverified
+    ))
+    return len(valid)
+
+
+def main():
+    """Основная логика работы бота."""
+    if not check_tokens():
+        return
+    if WORKERS > 1:
+        supervise(WORKERS)
+    else:
+        run_worker()
 
 
 if __name__ == '__main__':
-    main()
+    setup()
+    if sys.argv[1:2] == ['onboard']:
+        if len(sys.argv) != 3:
+            sys.exit(ONBOARD_USAGE)
+        onboard(sys.argv[2])
+    else:
+        main()
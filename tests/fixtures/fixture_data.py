@@ -2,6 +2,9 @@ import random
 from datetime import datetime
 
 import pytest
+import telegram
+
+import homework
 
 
 @pytest.fixture
@@ -19,3 +22,32 @@ def current_timestamp():
 @pytest.fixture
 def api_url():
     return 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
+
+
+@pytest.fixture
+def memory_notifier(monkeypatch):
+    """Адресат memory: копит сообщения в sent.
+
+    После throttle_after доставленных сообщений отвечает RetryAfter,
+    как Telegram при превышении частоты отправки.
+    """
+    sink = dict(sent=[], throttle_after=None)
+
+    def notify_memory(destination, message):
+        if len(sink['sent']) == sink['throttle_after']:
+            raise telegram.error.RetryAfter(30)
+        sink['sent'].append(message)
+
+    monkeypatch.setitem(homework.NOTIFIERS, 'memory', notify_memory)
+    return sink
+
+
+@pytest.fixture
+def worker_state():
+    """Состояние воркера с хранилищем в памяти."""
+    store = homework.open_store(':memory:')
+    yield dict(
+        store=store, digests={}, outbox=[], failing=set(), fingerprints={},
+        pending={}
+    )
+    store.close()
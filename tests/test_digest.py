@@ -0,0 +1,57 @@
+import homework
+
+
+class TestDigest:
+    DESTINATIONS = ({'type': 'memory'},)
+
+    def deliver(self, state, message, key='key'):
+        homework.deliver_status(state, key, self.DESTINATIONS, message, 1)
+
+    def flush(self, state, force=False):
+        homework.flush_digests(state['digests'], state['outbox'], force)
+        homework.drain_outbox(state['outbox'])
+
+    def test_join_messages_limit(self):
+        messages = ['a' * 30, 'b' * 30, 'c' * 30, 'd' * 100]
+        texts = homework.join_messages(messages, limit=64)
+        assert texts == [
+            'a' * 30 + '\n\n' + 'b' * 30, 'c' * 30, 'd' * 64
+        ], (
+            'Проверьте, что дайджест разбивается на тексты '
+            'не длиннее лимита Telegram'
+        )
+
+    def test_flush_by_size(self, monkeypatch, memory_notifier,
+                           worker_state):
+        monkeypatch.setattr(homework, 'DIGEST_WINDOW', 600)
+        monkeypatch.setattr(homework, 'DIGEST_SIZE', 2)
+        self.deliver(worker_state, 'first')
+        self.flush(worker_state)
+        assert not memory_notifier['sent'], (
+            'До окончания окна дайджест не должен отправляться'
+        )
+        self.deliver(worker_state, 'second')
+        self.flush(worker_state)
+        assert memory_notifier['sent'] == ['first\n\nsecond'], (
+            'Набранный дайджест должен уходить одним сообщением'
+        )
+
+    def test_flush_on_shutdown(self, monkeypatch, memory_notifier,
+                               worker_state):
+        monkeypatch.setattr(homework, 'DIGEST_WINDOW', 600)
+        self.deliver(worker_state, 'first')
+        self.flush(worker_state, force=True)
+        assert memory_notifier['sent'] == ['first'], (
+            'При остановке бота дайджесты должны отправляться'
+        )
+        assert not worker_state['digests']
+
+    def test_shared_chat_single_digest(self, monkeypatch, memory_notifier,
+                                       worker_state):
+        monkeypatch.setattr(homework, 'DIGEST_WINDOW', 600)
+        self.deliver(worker_state, 'first', key='first')
+        self.deliver(worker_state, 'second', key='second')
+        self.flush(worker_state, force=True)
+        assert memory_notifier['sent'] == ['first\n\nsecond'], (
+            'Статусы тенантов с общим чатом должны уходить одним дайджестом'
+        )
@@ -0,0 +1,76 @@
+import json
+from http import HTTPStatus
+
+import requests
+
+import homework
+
+
+class MockResponse:
+
+    def __init__(self, data):
+        self.status_code = HTTPStatus.OK
+        self.content = json.dumps(data).encode()
+        self.data = data
+        self.decoded = False
+
+    def json(self):
+        self.decoded = True
+        return self.data
+
+
+class TestFingerprint:
+    TENANT = homework.Tenant('token', 1, '1234:abcdefg')
+
+    def poll(self, monkeypatch, state, data):
+        response = MockResponse(data)
+        monkeypatch.setattr(requests, 'get', lambda **kwargs: response)
+        return homework.check_tenant(state, 'key', self.TENANT), response
+
+    def test_unchanged_answer_skipped(self, monkeypatch, worker_state):
+        result, _ = self.poll(
+            monkeypatch, worker_state, {'homeworks': [], 'current_date': 1}
+        )
+        assert result == 'idle'
+        result, response = self.poll(
+            monkeypatch, worker_state, {'homeworks': [], 'current_date': 2}
+        )
+        assert result == 'skipped' and not response.decoded, (
+            'Ответ, отличающийся только current_date, '
+            'не должен разбираться повторно'
+        )
+        result, _ = self.poll(monkeypatch, worker_state, {
+            'homeworks': [{'homework_name': 'hw', 'status': 'approved'}],
+            'current_date': 3
+        })
+        assert result == 'sent', (
+            'Изменившийся ответ должен обрабатываться'
+        )
+
+    def test_error_resets_fingerprint(self, monkeypatch, worker_state):
+        answer = {'homeworks': [], 'current_date': 1}
+        self.poll(monkeypatch, worker_state, answer)
+
+        def mock_failed_get(**kwargs):
+            raise requests.exceptions.ConnectionError
+
+        monkeypatch.setattr(requests, 'get', mock_failed_get)
+        result = homework.check_tenant(worker_state, 'key', self.TENANT)
+        assert result == 'error'
+        result, _ = self.poll(monkeypatch, worker_state, answer)
+        assert result == 'idle' and not worker_state['failing'], (
+            'После сбоя ответ должен обработаться заново, '
+            'чтобы отправить уведомление о восстановлении'
+        )
+
+    def test_error_message_hides_token(self, monkeypatch, worker_state):
+        def mock_failed_get(**kwargs):
+            raise requests.exceptions.ConnectionError
+
+        monkeypatch.setattr(requests, 'get', mock_failed_get)
+        homework.check_tenant(worker_state, 'key', self.TENANT)
+        message = worker_state['outbox'][0][3]
+        assert 'Authorization' in message and 'OAuth token' not in message, (
+            'Сообщения об ошибках уходят адресатам и не должны '
+            'содержать токен тенанта'
+        )
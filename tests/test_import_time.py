@@ -0,0 +1,51 @@
+import subprocess
+import sys
+from os.path import abspath, dirname
+
+ROOT_DIR = dirname(dirname(abspath(__file__)))
+IMPORT_TIME_BUDGET = 100000
+LAZY_MODULES = (
+    'telegram', 'requests', 'dotenv', 'smtplib', 'multiprocessing',
+    'concurrent.futures', 'email', 'csv'
+)
+
+
+def import_homework():
+    """Returns cumulative import time in us and names of imported modules."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c',
+         'import homework; assert not homework.logger.handlers'],
+        cwd=ROOT_DIR, capture_output=True, text=True, check=True
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|')
+        if cumulative.strip().isdigit():
+            modules[name.strip()] = int(cumulative)
+    return modules['homework'], set(modules)
+
+
+class TestImportTime:
+
+    def test_import_is_lazy(self):
+        _, modules = import_homework()
+        eager = [
+            name for name in modules
+            if any(
+                name == lazy or name.startswith(lazy + '.')
+                for lazy in LAZY_MODULES
+            )
+        ]
+        assert not eager, (
+            'Импорт homework не должен загружать тяжёлые зависимости: '
+            f'{eager}'
+        )
+
+    def test_import_time_budget(self):
+        best = min(import_homework()[0] for _ in range(3))
+        assert best < IMPORT_TIME_BUDGET, (
+            f'Импорт homework занял {best} мкс, '
+            f'бюджет {IMPORT_TIME_BUDGET} мкс'
+        )
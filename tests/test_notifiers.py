@@ -0,0 +1,191 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import smtplib
+import socketserver
+import threading
+import time
+
+import pytest
+import requests
+import telegram
+
+import homework
+
+
+class StubSMTPHandler(socketserver.StreamRequestHandler):
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        self.reply('220 stub')
+        while True:
+            line = self.rfile.readline().decode().strip()
+            command = line[:4].upper()
+            if not line or command == 'QUIT':
+                self.reply('221 bye')
+                return
+            if command == 'DATA':
+                self.reply('354 go on')
+                body = []
+                for data in iter(self.rfile.readline, b'.\r\n'):
+                    body.append(data.decode())
+                self.server.messages.append(''.join(body))
+            self.reply('250 ok')
+
+
+class StubTelegramHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        body = json.dumps({'ok': True, 'result': {
+            'message_id': 1, 'date': 0, 'chat': {'id': 1, 'type': 'private'}
+        }}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def telegram_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubTelegramHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def smtp_server():
+    server = socketserver.ThreadingTCPServer(
+        ('127.0.0.1', 0), StubSMTPHandler
+    )
+    server.messages = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class TestNotifiers:
+
+    def test_smtp(self, smtp_server):
+        host, port = smtp_server.server_address
+        destination = dict(
+            type='smtp', host=host, port=port,
+            sender='bot@example.com', to='student@example.com'
+        )
+        retry, throttled = homework.notify((destination,), 'Статус', [])
+        assert not retry and not throttled
+        assert len(smtp_server.messages) == 1, (
+            'Письмо должно быть принято SMTP-сервером'
+        )
+        assert 'student@example.com' in smtp_server.messages[0]
+
+    def test_slow_backend_does_not_block(self, monkeypatch,
+                                         memory_notifier):
+        monkeypatch.setitem(
+            homework.NOTIFIERS, 'slow',
+            lambda destination, message: time.sleep(2)
+        )
+        slow = dict(type='slow', timeout=0.2)
+        outbox = []
+        for message in ('first', 'second'):
+            homework.enqueue(
+                outbox, homework.PRIORITY_STATUS,
+                (slow, dict(type='memory')), message
+            )
+        started = time.time()
+        homework.drain_outbox(outbox)
+        assert time.time() - started < 1, (
+            'Медленный адресат не должен задерживать рассылку'
+        )
+        assert memory_notifier['sent'] == ['first', 'second']
+        assert [item[2] for item in outbox] == [(slow,), (slow,)], (
+            'Не ответивший адресат должен остаться в очереди'
+        )
+
+    def test_permanent_errors_not_retried(self, monkeypatch):
+        def failing(error):
+            def notifier(destination, message):
+                raise error
+            return notifier
+
+        def http_error(status):
+            response = requests.Response()
+            response.status_code = status
+            return requests.HTTPError(response=response)
+
+        errors = {
+            'gone': failing(http_error(404)),
+            'busy': failing(http_error(503)),
+            'mailbox': failing(smtplib.SMTPRecipientsRefused(
+                {'to': (550, b'no such user')}
+            )),
+            'refused': failing(smtplib.SMTPDataError(550, b'rejected')),
+            'greylisted': failing(smtplib.SMTPDataError(451, b'later')),
+        }
+        for name, notifier in errors.items():
+            monkeypatch.setitem(homework.NOTIFIERS, name, notifier)
+        retry, _ = homework.notify(
+            tuple(dict(type=name) for name in errors), 'Статус', []
+        )
+        assert retry == [dict(type='busy'), dict(type='greylisted')], (
+            'Отказы HTTP 4xx и SMTP 5xx не должны повторяться, '
+            'остальные - должны'
+        )
+
+    def test_bots_share_transport(self, monkeypatch):
+        monkeypatch.setattr(homework, 'telegram_bots', {})
+        monkeypatch.setattr(homework, 'telegram_transport', None)
+        monkeypatch.setattr(homework, 'TELEGRAM_POOL_SIZE', 4)
+        first = homework.get_bot('1234:abcdefg')
+        second = homework.get_bot('5678:hijklmn')
+        assert first is homework.get_bot('1234:abcdefg')
+        assert first.request is second.request, (
+            'Все боты процесса должны использовать общий HTTP-транспорт'
+        )
+        assert first.request.con_pool_size == 4
+        stats = homework.transport_stats()
+        assert stats['telegram_connections'] == 0
+
+    def test_transport_stats_after_send(self, monkeypatch, telegram_server):
+        monkeypatch.setattr(homework, 'telegram_transport', None)
+        monkeypatch.setattr(homework, 'transport_metrics', homework.Counter())
+        host, port = telegram_server.server_address
+        token = '1234:abcdefg'
+        monkeypatch.setattr(homework, 'telegram_bots', {token: telegram.Bot(
+            token=token, base_url=f'http://{host}:{port}/bot',
+            request=homework.get_transport()
+        )})
+        destination = dict(type='telegram', token=token, chat_id=1)
+        for message in ('first', 'second'):
+            homework.notify_telegram(destination, message)
+        stats = homework.transport_stats()
+        assert stats['telegram_sends'] == 2
+        assert stats['telegram_send_ms'] >= 0
+        assert stats['telegram_connections'] == 1, (
+            'Отправки должны переиспользовать одно соединение'
+        )
+        assert stats['telegram_requests'] == 2
+
+    def test_transport_stats_without_pool_internals(self, monkeypatch):
+        monkeypatch.setattr(homework, 'telegram_transport', object())
+        monkeypatch.setattr(
+            homework, 'transport_metrics',
+            homework.Counter(telegram_sends=1, telegram_send_ms=5)
+        )
+        assert homework.transport_stats() == dict(
+            telegram_sends=1, telegram_send_ms=5
+        ), (
+            'Без доступа к пулу соединений должны выводиться только '
+            'счётчики отправок'
+        )
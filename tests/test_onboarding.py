@@ -0,0 +1,146 @@
+from http import HTTPStatus
+
+import pytest
+import requests
+import telegram
+
+import homework
+
+VALID_PRACTICUM_TOKEN = 'valid'
+
+
+class MockResponse:
+
+    def __init__(self, headers):
+        token = headers['Authorization'].split()[-1]
+        self.status_code = {
+            VALID_PRACTICUM_TOKEN: HTTPStatus.OK,
+            'down': HTTPStatus.SERVICE_UNAVAILABLE,
+        }.get(token, HTTPStatus.UNAUTHORIZED)
+
+    def json(self):
+        return {'homeworks': [], 'current_date': 1}
+
+
+class MockTelegramBot:
+    calls = []
+
+    def __init__(self, token=None, **kwargs):
+        self.token = token
+
+    def get_me(self):
+        self.calls.append(('getMe', self.token))
+        if self.token.startswith('bad'):
+            raise telegram.error.Unauthorized('Unauthorized')
+
+    def get_chat(self, chat_id):
+        self.calls.append(('getChat', chat_id))
+        if chat_id == '404':
+            raise telegram.error.BadRequest('Chat not found')
+        if chat_id == '429' and self.calls.count(('getChat', '429')) == 1:
+            raise telegram.error.RetryAfter(0)
+        if chat_id == 'slow':
+            raise telegram.error.TimedOut()
+
+
+@pytest.fixture
+def mock_services(monkeypatch):
+    monkeypatch.setattr(
+        requests, 'get', lambda headers, **kwargs: MockResponse(headers)
+    )
+    monkeypatch.setattr(telegram, 'Bot', MockTelegramBot)
+    monkeypatch.setattr(homework, 'telegram_bots', {})
+    MockTelegramBot.calls = []
+
+
+class TestOnboarding:
+
+    def test_only_valid_tenants_stored(self, mock_services, monkeypatch,
+                                       tmp_path):
+        tenants_file = tmp_path / 'tenants.csv'
+        tenants_file.write_text(
+            '# practicum_token,chat_id,telegram_token\n'
+            'valid,1,1234:good\n'
+            'valid,2,1234:good\n'
+            'invalid,3,1234:good\n'
+            'valid,404,1234:good\n'
+            'valid,5,bad:token\n'
+        )
+        monkeypatch.setattr(homework, 'STATE_DB', str(tmp_path / 'state.db'))
+        assert homework.onboard(str(tenants_file)) == 2
+        store = homework.open_store(homework.STATE_DB)
+        stored = homework.stored_tenants(store)
+        store.close()
+        assert sorted(tenant.chat_id for tenant in stored) == ['1', '2'], (
+            'В хранилище должны попадать только прошедшие проверку тенанты'
+        )
+        assert MockTelegramBot.calls.count(('getMe', '1234:good')) == 1, (
+            'Проверка одного токена бота должна выполняться один раз'
+        )
+
+    def test_malformed_rows_rejected(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(homework, 'TELEGRAM_TOKEN', None)
+        tenants_file = tmp_path / 'tenants.csv'
+        tenants_file.write_text(
+            'valid\n'
+            'valid,1,1234:good,extra\n'
+            ',2,1234:good\n'
+            'valid,3\n'
+            'valid,4,1234:good\n'
+        )
+        tenants = homework.read_tenants_file(str(tenants_file))
+        assert tenants == [homework.Tenant('valid', '4', '1234:good')], (
+            'Строки с неверным числом полей, пустыми значениями и тенанты '
+            'без токена бота должны отклоняться, а не ронять подключение'
+        )
+
+    def test_transport_fits_onboard_threads(self, mock_services,
+                                            monkeypatch, tmp_path):
+        monkeypatch.setattr(homework, 'telegram_transport', None)
+        monkeypatch.setattr(homework, 'TELEGRAM_POOL_SIZE', 4)
+        monkeypatch.setattr(homework, 'ONBOARD_THREADS', 16)
+        monkeypatch.setattr(homework, 'STATE_DB', str(tmp_path / 'state.db'))
+        tenants_file = tmp_path / 'tenants.csv'
+        tenants_file.write_text('valid,1,1234:good\n')
+        homework.onboard(str(tenants_file))
+        assert homework.telegram_transport.con_pool_size == 16, (
+            'Пул соединений с Telegram не должен быть меньше '
+            'числа потоков проверки'
+        )
+
+    def test_api_check_has_timeout(self, monkeypatch):
+        calls = []
+
+        def mock_get(headers, **kwargs):
+            calls.append(kwargs)
+            return MockResponse(headers)
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        assert homework.check_practicum_token(VALID_PRACTICUM_TOKEN) is None
+        assert calls[0]['timeout'] == homework.API_TIMEOUT, (
+            'Запрос к API должен быть ограничен по времени, '
+            'иначе зависшее соединение остановит подключение'
+        )
+
+    def test_transient_failures_not_rejected(self, mock_services, caplog,
+                                             monkeypatch, tmp_path):
+        monkeypatch.setattr(homework, 'ONBOARD_BACKOFF', 0)
+        monkeypatch.setattr(homework, 'STATE_DB', str(tmp_path / 'state.db'))
+        tenants_file = tmp_path / 'tenants.csv'
+        tenants_file.write_text(
+            'valid,429,1234:good\n'
+            'valid,slow,1234:good\n'
+            'down,7,1234:good\n'
+        )
+        assert homework.onboard(str(tenants_file)) == 1, (
+            'После RetryAfter проверка должна повторяться'
+        )
+        assert MockTelegramBot.calls.count(('getChat', 'slow')) == (
+            homework.ONBOARD_RETRIES
+        ), (
+            'Временные сбои должны повторяться ONBOARD_RETRIES раз'
+        )
+        assert caplog.text.count('проверить не удалось') == 2, (
+            'Тенанты с временными сбоями должны отмечаться как '
+            'непроверенные, а не отклонённые'
+        )
@@ -0,0 +1,108 @@
+import homework
+
+
+class TestOutbox:
+    DESTINATIONS = ({'type': 'memory'},)
+
+    def enqueue(self, outbox, priority, message):
+        homework.enqueue(outbox, priority, self.DESTINATIONS, message)
+
+    def test_priority_order_and_merge(self, memory_notifier):
+        outbox = []
+        for _ in range(3):
+            self.enqueue(outbox, homework.PRIORITY_ERROR, 'error')
+        self.enqueue(outbox, homework.PRIORITY_RECOVERY, 'recovery')
+        self.enqueue(outbox, homework.PRIORITY_STATUS, 'status')
+        homework.drain_outbox(outbox)
+        assert memory_notifier['sent'] == [
+            'status', 'recovery', 'error (повторов: 3)'
+        ], (
+            'Статусы должны уходить раньше диагностики, '
+            'а повторы ошибок склеиваться'
+        )
+
+    def test_shed_errors_on_overflow(self, monkeypatch, memory_notifier):
+        monkeypatch.setattr(homework, 'OUTBOX_LIMIT', 2)
+        outbox = []
+        self.enqueue(outbox, homework.PRIORITY_ERROR, 'error')
+        self.enqueue(outbox, homework.PRIORITY_STATUS, 'first')
+        self.enqueue(outbox, homework.PRIORITY_STATUS, 'second')
+        self.enqueue(outbox, homework.PRIORITY_STATUS, 'third')
+        homework.drain_outbox(outbox)
+        assert memory_notifier['sent'] == ['first', 'second', 'third'], (
+            'При переполнении очереди должна отбрасываться диагностика, '
+            'но не изменения статусов'
+        )
+
+    def test_shed_errors_on_throttle(self, memory_notifier):
+        memory_notifier['throttle_after'] = 1
+        outbox = []
+        self.enqueue(outbox, homework.PRIORITY_ERROR, 'error')
+        self.enqueue(outbox, homework.PRIORITY_STATUS, 'first')
+        self.enqueue(outbox, homework.PRIORITY_STATUS, 'second')
+        homework.drain_outbox(outbox)
+        assert memory_notifier['sent'] == ['first'] and len(outbox) == 1, (
+            'При ограничении Telegram статус должен остаться в очереди, '
+            'а диагностика отброситься'
+        )
+        memory_notifier['throttle_after'] = None
+        homework.drain_outbox(outbox)
+        assert memory_notifier['sent'] == ['first', 'second']
+
+    def test_give_up_after_attempts(self, monkeypatch, memory_notifier):
+        monkeypatch.setattr(homework, 'OUTBOX_ATTEMPTS', 3)
+        monkeypatch.setitem(
+            homework.NOTIFIERS, 'broken',
+            lambda destination, message: 1 / 0
+        )
+        outbox = []
+        homework.enqueue(
+            outbox, homework.PRIORITY_STATUS,
+            ({'type': 'broken'}, {'type': 'memory'}), 'status'
+        )
+        for _ in range(3):
+            homework.drain_outbox(outbox)
+        assert not outbox and memory_notifier['sent'] == ['status'], (
+            'Адресат, не принявший статус за OUTBOX_ATTEMPTS попыток, '
+            'должен отбрасываться'
+        )
+
+    def test_from_date_saved_after_delivery(self, memory_notifier,
+                                            worker_state):
+        memory_notifier['throttle_after'] = 0
+        store = worker_state['store']
+        started = homework.load_from_date(store, 'key')
+        homework.deliver_status(
+            worker_state, 'key', self.DESTINATIONS, 'status', started + 100
+        )
+        homework.drain_and_save(worker_state)
+        assert homework.load_from_date(store, 'key') == started, (
+            'from_date не должен сдвигаться, пока статус не доставлен'
+        )
+        assert worker_state['pending'] == {'key': started + 100}
+        memory_notifier['throttle_after'] = None
+        homework.drain_and_save(worker_state)
+        assert homework.load_from_date(store, 'key') == started + 100, (
+            'После доставки статуса from_date должен сохраниться'
+        )
+        assert not worker_state['pending']
+
+    def test_stop_interrupts_cycle_drain(self, monkeypatch, memory_notifier):
+        monkeypatch.setitem(homework.worker_flags, 'stop', False)
+        outbox = []
+        self.enqueue(outbox, homework.PRIORITY_STATUS, 'first')
+        self.enqueue(outbox, homework.PRIORITY_STATUS, 'second')
+
+        def stop_after_send(destination, message):
+            memory_notifier['sent'].append(message)
+            homework.worker_flags['stop'] = True
+
+        monkeypatch.setitem(homework.NOTIFIERS, 'memory', stop_after_send)
+        homework.drain_outbox(outbox)
+        assert memory_notifier['sent'] == ['first'] and len(outbox) == 1, (
+            'По SIGTERM рассылка внутри цикла должна прерываться'
+        )
+        homework.drain_outbox(outbox, deadline=homework.time.time() + 5)
+        assert memory_notifier['sent'] == ['first', 'second'], (
+            'Финальная рассылка с deadline должна доработать очередь'
+        )
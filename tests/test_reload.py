@@ -0,0 +1,104 @@
+import json
+
+import pytest
+
+import homework
+
+
+@pytest.fixture
+def config_file(monkeypatch, tmp_path):
+    for name in homework.ENVIRONMENT_SETTINGS:
+        monkeypatch.setattr(homework, name, getattr(homework, name))
+    monkeypatch.setenv('PRACTICUM_TOKEN', 'sometoken')
+    monkeypatch.setenv('TELEGRAM_TOKEN', '1234:abcdefg')
+    monkeypatch.setenv('TELEGRAM_CHAT_ID', '12345')
+    config_file = tmp_path / 'config.json'
+    monkeypatch.setenv('CONFIG_FILE', str(config_file))
+    return config_file
+
+
+class TestReload:
+
+    def test_reload_applies_changes(self, config_file, worker_state):
+        config_file.write_text(json.dumps({
+            'tuning': {'retry_time': 60},
+            'tenants': [{'practicum_token': 'token', 'chat_id': 1}],
+        }))
+        worker_state.update(
+            failing={'old'}, fingerprints={'old': b''}, pending={'old': 1}
+        )
+        tenants = homework.reload_worker(worker_state, {'old': None})
+        assert homework.RETRY_TIME == 60, (
+            'Настройки из конфига должны применяться без перезапуска'
+        )
+        assert 'old' not in tenants and len(tenants) == 2, (
+            'Список тенантов должен перечитываться из конфига'
+        )
+        assert not worker_state['failing']
+        assert not worker_state['fingerprints']
+
+    def test_reload_keeps_settings_on_error(self, config_file, worker_state):
+        config_file.write_text('{"tuning": {"unknown": 1}}')
+        retry_time = homework.RETRY_TIME
+        tenants = {'old': None}
+        assert homework.reload_worker(
+            worker_state,
+            tenants
+        ) is tenants, (
+            'При ошибке в конфиге должны остаться прежние тенанты'
+        )
+        assert homework.RETRY_TIME == retry_time
+
+    @pytest.mark.parametrize('config', [
+        {'tuning': []},
+        [1],
+        {'tenants': {}},
+        {'tenants': [{'practicum_token': 123, 'chat_id': 1}]},
+        {'tenants': [{'practicum_token': 'token', 'chat_id': 1,
+                      'notifiers': ['webhook']}]},
+    ])
+    def test_reload_rejects_malformed_config(
+        self, config_file, config, worker_state
+    ):
+        config_file.write_text(json.dumps(config))
+        tenants = {'old': None}
+        assert homework.reload_worker(
+            worker_state,
+            tenants
+        ) is tenants, (
+            'Конфиг неверной структуры не должен ронять воркер'
+        )
+        homework.reload_supervisor({})
+
+    def test_reload_restores_environment_on_error(
+        self, monkeypatch, config_file, worker_state
+    ):
+        config_file.write_text('{}')
+        token = homework.PRACTICUM_TOKEN
+        monkeypatch.setenv('PRACTICUM_TOKEN', 'newtoken')
+        monkeypatch.setenv('NOTIFY_THREADS', 'many')
+        tenants = {'old': None}
+        assert homework.reload_worker(
+            worker_state,
+            tenants
+        ) is tenants
+        assert homework.PRACTICUM_TOKEN == token, (
+            'При ошибке в окружении не должны меняться никакие настройки'
+        )
+
+    def test_environment_settings_complete(self):
+        assigned = {
+            name for name in homework.read_environment.__code__.co_names
+            if name.isupper()
+        }
+        assert assigned == set(homework.ENVIRONMENT_SETTINGS), (
+            'ENVIRONMENT_SETTINGS должен перечислять все настройки '
+            'из read_environment'
+        )
+
+    def test_supervisor_reload(self, config_file):
+        config_file.write_text('{"tuning": {"lease_ttl": 42}}')
+        homework.reload_supervisor({})
+        assert homework.lease_ttl() == 42, (
+            'Супервизор должен видеть тот же lease_ttl, что и воркеры'
+        )
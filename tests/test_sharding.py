@@ -0,0 +1,70 @@
+import homework
+
+
+class TestSharding:
+    TENANTS = {
+        homework.tenant_key(homework.Tenant(f'token{i}', i, 'bot')): None
+        for i in range(50)
+    }
+
+    def test_ring_owner_stable(self):
+        ring = homework.build_ring(['first', 'second'])
+        owners = {
+            key: homework.ring_owner(ring, key) for key in self.TENANTS
+        }
+        assert set(owners.values()) == {'first', 'second'}, (
+            'Тенанты должны распределяться между всеми воркерами'
+        )
+        ring = homework.build_ring(['first', 'second', 'third'])
+        moved = [
+            key for key, owner in owners.items()
+            if homework.ring_owner(ring, key) not in (owner, 'third')
+        ]
+        assert not moved, (
+            'При добавлении воркера тенанты должны переходить только к нему'
+        )
+
+    def test_no_double_polling(self, tmp_path):
+        path = str(tmp_path / 'state.db')
+        first = homework.open_store(path)
+        second = homework.open_store(path)
+        assert len(homework.owned_tenants(first, 'A', self.TENANTS)) == 50
+        assert not homework.owned_tenants(second, 'B', self.TENANTS), (
+            'Воркер не должен брать тенантов, арендованных другим'
+        )
+        owned_first = homework.owned_tenants(first, 'A', self.TENANTS)
+        owned_second = homework.owned_tenants(second, 'B', self.TENANTS)
+        assert owned_first and owned_second
+        assert not set(owned_first) & set(owned_second), (
+            'Один тенант не должен опрашиваться двумя воркерами'
+        )
+        homework.leave_store(second, 'B')
+        assert len(homework.owned_tenants(first, 'A', self.TENANTS)) == 50, (
+            'После ухода воркера его тенанты должны перейти к оставшимся'
+        )
+        first.close()
+
+    def test_progress_created_with_leases(self, tmp_path):
+        store = homework.open_store(str(tmp_path / 'state.db'))
+        owned = homework.owned_tenants(store, 'A', self.TENANTS)
+        count, = store.execute('SELECT count(*) FROM progress').fetchone()
+        assert count == len(owned), (
+            'Начальные метки времени должны создаваться вместе с арендой'
+        )
+        assert not store.in_transaction
+        store.close()
+
+    def test_keep_alive_extends_leases(self, tmp_path):
+        path = str(tmp_path / 'state.db')
+        first = homework.open_store(path)
+        second = homework.open_store(path)
+        homework.owned_tenants(first, 'A', self.TENANTS)
+        first.execute('UPDATE leases SET expires = 0')
+        first.execute('UPDATE workers SET heartbeat = 0')
+        homework.keep_alive(first, 'A')
+        assert not homework.owned_tenants(second, 'B', self.TENANTS), (
+            'Воркер посреди долгого цикла должен продлевать heartbeat и '
+            'аренды, чтобы их не забрали другие'
+        )
+        first.close()
+        second.close()
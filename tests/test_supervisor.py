@@ -0,0 +1,39 @@
+import homework
+
+
+class DeadProcess:
+    pid = 1
+    exitcode = 1
+
+    def is_alive(self):
+        return False
+
+
+class TestSupervisor:
+
+    def test_dead_worker_backoff(self, monkeypatch):
+        started = []
+        monkeypatch.setattr(
+            homework, 'start_worker',
+            lambda index, slot, metrics_queue: started.append(index)
+        )
+        slot = dict(
+            process=DeadProcess(), pid=1, seen=0, failures=0, restart_at=0
+        )
+        pool = {0: slot}
+        metrics = {0: {'cycles': 1}}
+        delays = []
+        for _ in range(3):
+            slot['process'] = DeadProcess()
+            homework.restart_workers(pool, metrics, None)
+            delays.append(slot['restart_at'] - homework.time.time())
+        assert not metrics, (
+            'Метрики упавшего воркера не должны учитываться'
+        )
+        assert delays[0] < delays[1] < delays[2], (
+            'Перезапуск падающего воркера должен откладываться всё дольше'
+        )
+        assert not started
+        slot['restart_at'] = 0
+        homework.restart_workers(pool, metrics, None)
+        assert started == [0]